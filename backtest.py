@@ -4,44 +4,93 @@ Portfolio construction and backtest utilities.
 Functions:
 - month_ends(dates)
 - backtest_positions(panel, monthly_positions, tc_bps)
+- equity_and_dd(returns)
 - compute_perf_stats(returns, freq=252)
 
 Outputs daily portfolio returns and diagnostics (turnover, equity, drawdown).
 """
 from __future__ import annotations
 
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from numba import njit
+
+from data import Panel
+
+
+@njit(cache=True)
+def _perf_kernel(r: np.ndarray, freq: float) -> Tuple[float, float, float]:
+    """CAGR, Sharpe and MaxDD in one streaming pass over a clean return array."""
+    n = r.size
+    eq = 1.0
+    peak = 1.0
+    mdd = 0.0
+    s = 0.0
+    s2 = 0.0
+    for x in r:
+        eq *= 1.0 + x
+        if eq > peak:
+            peak = eq
+        dd = eq / peak - 1.0
+        if dd < mdd:
+            mdd = dd
+        s += x
+        s2 += x * x
+    mean = s / n
+    # sample variance (ddof=1), clamped against cancellation
+    var = (s2 - s * s / n) / (n - 1) if n > 1 else 0.0
+    if var < 0.0:
+        var = 0.0
+    cagr = eq ** (freq / n) - 1.0
+    sharpe = mean / (np.sqrt(var) + 1e-12) * np.sqrt(freq)
+    return cagr, sharpe, mdd
 
 
 def month_ends(dates: pd.Index) -> pd.DatetimeIndex:
-    s = pd.Series(pd.to_datetime(dates).unique()).sort_values()
-    return s.groupby([s.dt.year, s.dt.month]).max().values
-
-
-def compute_perf_stats(returns: pd.Series, freq: int = 252) -> Dict[str, float]:
+    # last date per month: a date is a month end iff the next one starts a
+    # new month, so a single diff replaces the sort+hash groupby
+    d = np.sort(pd.to_datetime(dates).unique().values.astype("datetime64[D]"))
+    ym = d.astype("datetime64[M]").astype(np.int32)
+    last = np.r_[ym[1:] != ym[:-1], True]
+    return pd.DatetimeIndex(d[last])
+
+
+def equity_and_dd(returns: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """Equity curve, running peak and drawdown, computed once for all consumers."""
+    eq = np.cumprod(1.0 + returns.to_numpy())
+    peak = np.maximum.accumulate(eq)
+    dd = eq / peak - 1.0
+    idx = returns.index
+    return pd.Series(eq, index=idx), pd.Series(peak, index=idx), pd.Series(dd, index=idx)
+
+
+def compute_perf_stats(
+    returns: pd.Series,
+    freq: int = 252,
+    equity: Optional[pd.Series] = None,
+    dd: Optional[pd.Series] = None,
+) -> Dict[str, float]:
     r = returns.dropna()
     if r.empty:
         return {"CAGR": 0.0, "Sharpe": 0.0, "MaxDD": 0.0}
 
-    equity = (1 + r).cumprod()
-    years = len(r) / float(freq) if freq > 0 else 0.0
-    cagr = equity.iloc[-1] ** (1.0 / years) - 1.0 if years > 0 else 0.0
-    sharpe = (r.mean() / (r.std() + 1e-12)) * np.sqrt(freq)
-
-    peak = equity.cummax()
-    dd = equity / peak - 1
-    mdd = dd.min()
+    if equity is not None and dd is not None:
+        # reuse the caller's cumulative pass
+        years = len(r) / float(freq) if freq > 0 else 0.0
+        cagr = equity.iloc[-1] ** (1.0 / years) - 1.0 if years > 0 else 0.0
+        sharpe = (r.mean() / (r.std() + 1e-12)) * np.sqrt(freq)
+        return {"CAGR": float(cagr), "Sharpe": float(sharpe), "MaxDD": float(dd.min())}
 
+    cagr, sharpe, mdd = _perf_kernel(r.to_numpy(dtype=np.float64), float(freq))
     return {"CAGR": float(cagr), "Sharpe": float(sharpe), "MaxDD": float(mdd)}
 
 
-def backtest_positions(panel: pd.DataFrame, monthly_positions: Dict[pd.Timestamp, pd.Series], tc_bps: float = 5.0) -> Tuple[pd.Series, Dict[str, float]]:
+def backtest_positions(panel: Panel, monthly_positions: Dict[pd.Timestamp, pd.Series], tc_bps: float = 5.0) -> Tuple[pd.Series, Dict[str, float]]:
     """Convert monthly_weights -> daily returns, accounting for simple transaction costs.
 
-    - panel: must include 'close' column; index (date,ticker)
+    - panel: data.Panel with a 'close' field
     - monthly_positions: dict mapping rebalance date -> Series(weights indexed by ticker)
 
     Returns (port_daily_returns, diagnostics)
@@ -49,23 +98,41 @@ def backtest_positions(panel: pd.DataFrame, monthly_positions: Dict[pd.Timestamp
     if not monthly_positions:
         raise RuntimeError("No positions provided for backtest")
 
-    # price panel: wide
-    px = panel["close"].unstack("ticker").sort_index()
-    daily_ret = px.pct_change()
+    # the panel already holds close as a (date x ticker) matrix
+    px = panel.data["close"]
+    daily_index = panel.dates
+
+    n_days, n_tickers = px.shape
+
+    daily_ret = np.full_like(px, np.nan)
+    daily_ret[1:] = px[1:] / px[:-1] - 1.0
 
-    pos_df = pd.DataFrame(monthly_positions).T.sort_index()
-    pos_df = pos_df.reindex(columns=daily_ret.columns).fillna(0.0)
+    # rebalance weight matrix: one row per rebalance date, ticker -> column
+    rebal_ts = pd.DatetimeIndex(sorted(monthly_positions))
+    W = np.zeros((len(rebal_ts), n_tickers), dtype=np.float32)
+    for i, d in enumerate(rebal_ts):
+        w = monthly_positions[d]
+        cols = panel.tickers.get_indexer(w.index)
+        keep = cols >= 0
+        W[i, cols[keep]] = w.values[keep]
 
-    # forward-fill to daily index (apply from rebalance date forward)
-    daily_w = pos_df.reindex(daily_ret.index, method="ffill").fillna(0.0)
+    # expand to daily (each rebalance row applies from its date forward)
+    pos_starts = np.searchsorted(daily_index.values, rebal_ts.values)
+    daily_w = np.zeros((n_days, n_tickers), dtype=np.float32)
+    reps = np.diff(np.r_[pos_starts, n_days])
+    daily_w[pos_starts[0]:] = np.repeat(W, reps, axis=0)
 
     # turnover on rebalance days (sum abs changes)/2
-    w_change = daily_w.diff().fillna(0.0)
-    turnover = (w_change.abs().sum(axis=1) / 2.0)
-    tc = turnover * (tc_bps / 10000.0)
+    w_change = np.diff(W, axis=0, prepend=np.zeros((1, n_tickers), dtype=np.float32))
+    turnover_days = np.zeros(n_days)
+    turnover_days[pos_starts] = np.abs(w_change).sum(axis=1) / 2.0
+    turnover = pd.Series(turnover_days, index=daily_index)
+    tc = turnover_days * (tc_bps / 10000.0)
 
     # apply yesterday's weights to today's returns (weights known at open)
-    port_ret = (daily_w.shift(1).fillna(0.0) * daily_ret).sum(axis=1) - tc
+    ret_vals = np.nan_to_num(daily_ret, nan=0.0)
+    w_lag = np.vstack([np.zeros((1, n_tickers), dtype=np.float32), daily_w[:-1]])
+    port_ret = pd.Series((w_lag * ret_vals).sum(axis=1) - tc, index=daily_index)
 
     stats = compute_perf_stats(port_ret)
     # add turnover summary
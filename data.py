@@ -1,17 +1,24 @@
 """data.py
 Data acquisition and caching utilities.
 
-Functions:
+Functions / classes:
 - get_sp500_tickers(): fetch tickers from Wikipedia
 - download_ohlcv(...): download OHLCV via yfinance (batching)
 - load_or_download(...): caching wrapper (parquet)
+- Panel: structure-of-arrays container, one (date x ticker) matrix per field
 - to_long_panel(...): convert yfinance-wide to long panel (date, ticker) index
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import List, Optional
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
@@ -19,11 +26,18 @@ import yfinance as yf
 import urllib.request
 
 
-def get_sp500_tickers() -> List[str]:
+def get_sp500_tickers(cache_path: str = "data/sp500_tickers.json", ttl_days: int = 7) -> List[str]:
     """
     Return current S&P 500 tickers from Wikipedia (with User-Agent).
     Avoids 403 Forbidden errors.
+
+    The list is cached as JSON with a TTL so repeat runs skip the download
+    and HTML parse entirely; a stale cache is used as fallback if the
+    fetch fails.
     """
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < ttl_days * 86400:
+        with open(cache_path) as f:
+            return json.load(f)
 
     url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
 
@@ -32,57 +46,190 @@ def get_sp500_tickers() -> List[str]:
         headers={"User-Agent": "Mozilla/5.0"}
     )
 
-    with urllib.request.urlopen(req) as resp:
-        html = resp.read()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            html = resp.read()
 
-    table = pd.read_html(html)[0]
+        table = pd.read_html(html)[0]
 
-    tickers = table["Symbol"].astype(str).tolist()
+        tickers = table["Symbol"].astype(str).tolist()
+    except Exception:
+        # fetch failed: fall back to a stale cache if one exists
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                return json.load(f)
+        raise
 
     # BRK.B -> BRK-B etc.
-    return [t.replace(".", "-") for t in tickers]
+    tickers = [t.replace(".", "-") for t in tickers]
+
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(tickers, f)
+    except Exception:
+        # best-effort: ignore cache errors
+        pass
+
+    return tickers
 
 
 
-def download_ohlcv(tickers: List[str], start: str, end: Optional[str] = None, threads: bool = True) -> pd.DataFrame:
-    """Download OHLCV for tickers using yfinance.
+def download_ohlcv(
+    tickers: List[str],
+    start: str,
+    end: Optional[str] = None,
+    batch_size: int = 50,
+    max_workers: int = 8,
+    shard_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """Download OHLCV for tickers using yfinance, in concurrent batches.
+
+    Batches are fetched on a thread pool (network-bound, GIL released during
+    socket waits). With shard_dir set, each batch persists to its own parquet
+    shard and existing shards are reused, so an interrupted download resumes
+    instead of restarting from scratch.
 
     Returns a wide DataFrame as yfinance downloads (MultiIndex columns: ticker, field).
     """
-    data = yf.download(
-        tickers,
-        start=start,
-        end=end,
-        auto_adjust=False,
-        progress=False,
-        group_by="ticker",
-        threads=threads,
-    )
-    return data
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    parts: List[Optional[pd.DataFrame]] = [None] * len(batches)
 
+    def fetch(i: int, batch: List[str]) -> pd.DataFrame:
+        if shard_dir is not None:
+            # key by batch contents and date range, not just position, so a
+            # changed universe or range can never resume from a stale shard
+            key = hashlib.sha1(f"{batch}|{start}|{end}".encode()).hexdigest()[:12]
+            shard_path = os.path.join(shard_dir, f"{i:04d}_{key}.parquet")
+            if os.path.exists(shard_path):
+                try:
+                    return pd.read_parquet(shard_path)
+                except Exception:
+                    pass
+        part = yf.download(
+            batch,
+            start=start,
+            end=end,
+            auto_adjust=False,
+            progress=False,
+            group_by="ticker",
+            threads=False,
+        )
+        if shard_dir is not None:
+            try:
+                part.to_parquet(shard_path)
+            except Exception:
+                # best-effort: ignore shard errors
+                pass
+        return part
 
-def to_long_panel(wide: pd.DataFrame) -> pd.DataFrame:
-    """Convert yfinance 'wide' output to a long panel with MultiIndex (date, ticker).
+    if shard_dir is not None:
+        os.makedirs(shard_dir, exist_ok=True)
 
-    Keeps normalized column names: open, high, low, close, adj_close, volume.
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {ex.submit(fetch, i, b): i for i, b in enumerate(batches)}
+        for fut in as_completed(futures):
+            parts[futures[fut]] = fut.result()
+
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts, axis=1)
+
+
+_FIELDS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+
+class Panel:
+    """Structure-of-arrays OHLCV panel.
+
+    Every downstream consumer (features, model, backtest) ultimately wants
+    (date x ticker) matrices, so fields are stored exactly that way:
+    data[field] is a float64 ndarray of shape (n_dates, n_tickers), aligned
+    to self.dates / self.tickers. This removes the unstack/stack/groupby
+    round-trips a long MultiIndex frame forces on every consumer.
     """
-    if not isinstance(wide.columns, pd.MultiIndex):
-        # single-ticker download: convert to 2-level columns
-        wide.columns = pd.MultiIndex.from_product([ [list(wide.columns.name or "_single_")], wide.columns ])
 
-    # stack tickers -> columns become field names
-    long = wide.stack(level=0).rename_axis(index=["date", "ticker"]).reset_index()
+    def __init__(self, dates: pd.DatetimeIndex, tickers: pd.Index, data: Dict[str, np.ndarray]):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = pd.Index(tickers)
+        self.data = dict(data)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.data)
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.data
+
+    @classmethod
+    def from_wide(cls, wide: pd.DataFrame) -> "Panel":
+        """Build from yfinance 'wide' output (MultiIndex columns: ticker, field)."""
+        if not isinstance(wide.columns, pd.MultiIndex):
+            # single-ticker download: convert to 2-level columns
+            wide.columns = pd.MultiIndex.from_product([ [list(wide.columns.name or "_single_")], wide.columns ])
+
+        wide = wide.sort_index()
+        dates = pd.DatetimeIndex(wide.index)
+        tickers = wide.columns.get_level_values(0).unique().sort_values()
+
+        data: Dict[str, np.ndarray] = {}
+        for raw_field in wide.columns.get_level_values(1).unique():
+            name = str(raw_field).lower().replace(" ", "_")
+            if name not in _FIELDS:
+                continue
+            mat = wide.xs(raw_field, axis=1, level=1).reindex(columns=tickers)
+            data[name] = mat.to_numpy(dtype=np.float64)
+
+        # keep canonical field order
+        data = {f: data[f] for f in _FIELDS if f in data}
+        return cls(dates, tickers, data)
+
+    @classmethod
+    def from_long(cls, df: pd.DataFrame) -> "Panel":
+        """Build from a long MultiIndex (date, ticker) frame."""
+        dates = df.index.get_level_values("date").unique().sort_values()
+        tickers = df.index.get_level_values("ticker").unique().sort_values()
+        full = pd.MultiIndex.from_product([dates, tickers], names=["date", "ticker"])
+        aligned = df.reindex(full)
+        data = {
+            c: aligned[c].to_numpy(dtype=np.float64).reshape(len(dates), len(tickers))
+            for c in df.columns
+        }
+        return cls(dates, tickers, data)
 
-    # normalize column names
-    cols = {c: c.lower().replace(" ", "_") for c in long.columns if c not in ["date", "ticker"]}
-    long = long.rename(columns=cols)
+    def to_long(self) -> pd.DataFrame:
+        """Long MultiIndex (date, ticker) frame, e.g. for parquet caching.
 
-    keep = ["date", "ticker", "open", "high", "low", "close", "adj_close", "volume"]
-    cols_present = [c for c in keep if c in long.columns]
-    long = long[cols_present]
+        The ticker level is categorical: integer codes instead of repeated
+        object strings, so the frame serializes smaller and any groupby or
+        join on the level hashes int32 codes rather than Python strings.
+        """
+        idx = pd.MultiIndex.from_product(
+            [self.dates, pd.CategoricalIndex(self.tickers)], names=["date", "ticker"]
+        )
+        return pd.DataFrame({f: mat.ravel() for f, mat in self.data.items()}, index=idx)
 
-    long = long.sort_values(["ticker", "date"]).set_index(["date", "ticker"])  # MultiIndex
-    return long
+
+def to_long_panel(wide: pd.DataFrame) -> pd.DataFrame:
+    """Convert yfinance 'wide' output to a long panel with MultiIndex (date, ticker).
+
+    Keeps normalized column names: open, high, low, close, adj_close, volume.
+
+    Goes through Panel.from_wide and assembles the MultiIndex directly from
+    level codes: each field is copied exactly once (a ticker-major ravel of
+    its matrix) instead of the previous stack / reset_index / sort_values /
+    set_index chain, which copied the full multi-million-row frame at every
+    step. Row order stays (ticker, date) as before.
+    """
+    panel = Panel.from_wide(wide)
+    n_dates = len(panel.dates)
+    n_tickers = len(panel.tickers)
+    idx = pd.MultiIndex(
+        levels=[panel.dates, pd.CategoricalIndex(panel.tickers)],
+        codes=[np.tile(np.arange(n_dates), n_tickers), np.repeat(np.arange(n_tickers), n_dates)],
+        names=["date", "ticker"],
+    )
+    return pd.DataFrame({f: mat.T.ravel() for f, mat in panel.data.items()}, index=idx)
 
 
 def load_or_download(cache_path: str, tickers: List[str], start: str, end: Optional[str] = None, force: bool = False) -> pd.DataFrame:
@@ -98,7 +245,14 @@ def load_or_download(cache_path: str, tickers: List[str], start: str, end: Optio
         except Exception:
             pass
 
-    wide = download_ohlcv(tickers, start=start, end=end)
+    # per-batch shards: interrupted downloads resume from completed batches
+    shard_dir = os.path.splitext(cache_path)[0] + "_shards"
+    if force:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    wide = download_ohlcv(tickers, start=start, end=end, shard_dir=shard_dir)
+    # full download succeeded: resume state must not outlive the run it belongs to
+    shutil.rmtree(shard_dir, ignore_errors=True)
     # Save to parquet where possible (pandas handles MultiIndex columns)
     try:
         wide.to_parquet(cache_path)
@@ -5,62 +5,71 @@ Functions:
 - add_features(panel): computes momentum, vol, px_vs_ma200, ret_5d, dd_63, log_dvol_21
 - add_target(panel, horizon): forward return target y
 
-Assumes input panel index = (date, ticker) and column 'close' present.
+Operates on the structure-of-arrays Panel: every feature is a direct
+vectorized pass over the (date x ticker) field matrices.
 """
 from __future__ import annotations
 
-from typing import Iterable
-
 import numpy as np
-import pandas as pd
+
+from data import Panel
+from features_numba import rolling_max_2d, rolling_mean_2d, rolling_std_2d
+
+
+def _pct_change(a: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full_like(a, np.nan)
+    out[periods:] = a[periods:] / a[:-periods] - 1.0
+    return out
+
+
+def _roll(kernel, a: np.ndarray, w: int) -> np.ndarray:
+    """Apply a (n_series, n_time) numba kernel to a (date x ticker) matrix."""
+    return kernel(np.ascontiguousarray(a.T), w).T
 
 
-def add_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Return a new DataFrame with added features.
+def add_features(panel: Panel) -> Panel:
+    """Return a new Panel with added feature matrices.
 
-    Input df: MultiIndex (date,ticker) -> columns include 'close' and optionally 'volume'.
+    Input panel: fields include 'close' and optionally 'volume'.
     """
-    df = df.copy()
+    px = panel.data["close"]
 
     # daily return
-    df["ret_1d"] = df.groupby(level="ticker")["close"].pct_change()
+    ret1 = _pct_change(px)
+    feats = {"ret_1d": ret1}
 
     # momentum windows (simple pct change over window)
     for w in [21, 63, 126, 252]:
-        df[f"mom_{w}"] = df.groupby(level="ticker")["close"].pct_change(w)
+        feats[f"mom_{w}"] = _pct_change(px, w)
 
     # realized volatility (std of daily returns)
     for w in [21, 63]:
-        df[f"vol_{w}"] = (
-            df.groupby(level="ticker")["ret_1d"].rolling(w).std().reset_index(level=0, drop=True)
-        )
+        feats[f"vol_{w}"] = _roll(rolling_std_2d, ret1, w)
 
     # price vs MA200
-    ma200 = df.groupby(level="ticker")["close"].rolling(200).mean().reset_index(level=0, drop=True)
-    df["px_vs_ma200"] = df["close"] / ma200 - 1.0
+    feats["px_vs_ma200"] = px / _roll(rolling_mean_2d, px, 200) - 1.0
 
     # short-term reversal
-    df["ret_5d"] = df.groupby(level="ticker")["close"].pct_change(5)
+    feats["ret_5d"] = _pct_change(px, 5)
 
     # rolling max drawdown over 63 days
-    roll_max = df.groupby(level="ticker")["close"].rolling(63).max().reset_index(level=0, drop=True)
-    df["dd_63"] = df["close"] / roll_max - 1.0
+    feats["dd_63"] = px / _roll(rolling_max_2d, px, 63) - 1.0
 
     # log dollar volume 21d
-    if "volume" in df.columns:
-        dollar_vol = df["close"] * df["volume"]
-        dv21 = dollar_vol.groupby(level="ticker").rolling(21).mean().reset_index(level=0, drop=True)
-        df["log_dvol_21"] = np.log1p(dv21)
+    if "volume" in panel:
+        dollar_vol = px * panel.data["volume"]
+        feats["log_dvol_21"] = np.log1p(_roll(rolling_mean_2d, dollar_vol, 21))
 
-    return df
+    return Panel(panel.dates, panel.tickers, {**panel.data, **feats})
 
 
-def add_target(df: pd.DataFrame, horizon: int = 63) -> pd.DataFrame:
-    """Add forward target y_fwd (close(t+h)/close(t) - 1) without look-ahead leakage.
+def add_target(panel: Panel, horizon: int = 63) -> Panel:
+    """Add forward target y_fwd_3m (close(t+h)/close(t) - 1) without look-ahead leakage.
 
-    Shifts are done per ticker.
+    The shift is a row shift of the close matrix, applied per ticker by construction.
     """
-    df = df.copy()
-    future_close = df.groupby(level="ticker")["close"].shift(-horizon)
-    df["y_fwd_3m"] = future_close / df["close"] - 1.0
-    return df
+    px = panel.data["close"]
+    future_close = np.full_like(px, np.nan)
+    future_close[:-horizon] = px[horizon:]
+    y = future_close / px - 1.0
+    return Panel(panel.dates, panel.tickers, {**panel.data, "y_fwd_3m": y})
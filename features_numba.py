@@ -0,0 +1,99 @@
+"""features_numba.py
+Numba streaming rolling kernels for the feature matrices.
+
+Kernels operate on (n_series, n_time) float64 arrays (series-major so the
+prange parallel axis is contiguous) and maintain running accumulators,
+so each window is O(1) per step instead of O(W). Semantics match pandas
+rolling with min_periods = window: any NaN inside the window yields NaN.
+
+fastmath is deliberately left off: NaN is a load-bearing sentinel here and
+fastmath's no-NaN assumption would break the isnan bookkeeping.
+"""
+from __future__ import annotations
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def rolling_mean_2d(a: np.ndarray, w: int) -> np.ndarray:
+    n_series, n_t = a.shape
+    out = np.full((n_series, n_t), np.nan)
+    for j in prange(n_series):
+        s = 0.0
+        nan_ct = 0
+        for i in range(n_t):
+            x = a[j, i]
+            if x != x:
+                nan_ct += 1
+            else:
+                s += x
+            if i >= w:
+                old = a[j, i - w]
+                if old != old:
+                    nan_ct -= 1
+                else:
+                    s -= old
+            if i >= w - 1 and nan_ct == 0:
+                out[j, i] = s / w
+    return out
+
+
+@njit(parallel=True, cache=True)
+def rolling_std_2d(a: np.ndarray, w: int) -> np.ndarray:
+    n_series, n_t = a.shape
+    out = np.full((n_series, n_t), np.nan)
+    for j in prange(n_series):
+        s = 0.0
+        s2 = 0.0
+        nan_ct = 0
+        for i in range(n_t):
+            x = a[j, i]
+            if x != x:
+                nan_ct += 1
+            else:
+                s += x
+                s2 += x * x
+            if i >= w:
+                old = a[j, i - w]
+                if old != old:
+                    nan_ct -= 1
+                else:
+                    s -= old
+                    s2 -= old * old
+            if i >= w - 1 and nan_ct == 0:
+                # sample variance (ddof=1), clamped against cancellation
+                var = (s2 - s * s / w) / (w - 1)
+                if var < 0.0:
+                    var = 0.0
+                out[j, i] = np.sqrt(var)
+    return out
+
+
+@njit(parallel=True, cache=True)
+def rolling_max_2d(a: np.ndarray, w: int) -> np.ndarray:
+    n_series, n_t = a.shape
+    out = np.full((n_series, n_t), np.nan)
+    for j in prange(n_series):
+        nan_ct = 0
+        max_idx = -1
+        for i in range(n_t):
+            x = a[j, i]
+            if x != x:
+                nan_ct += 1
+            if i >= w:
+                old = a[j, i - w]
+                if old != old:
+                    nan_ct -= 1
+            if x == x and (max_idx < 0 or x >= a[j, max_idx]):
+                max_idx = i
+            if i >= w - 1 and nan_ct == 0:
+                if max_idx < i - w + 1:
+                    # running max left the window: rescan once
+                    m = i - w + 1
+                    for k in range(i - w + 2, i + 1):
+                        if a[j, k] >= a[j, m]:
+                            m = k
+                    max_idx = m
+                out[j, i] = a[j, max_idx]
+    return out
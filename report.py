@@ -1,44 +1,82 @@
 """report.py
 Plotting and reporting utilities: equity curve and drawdown plots.
+
+For pipeline runs (save_path given) figures are built with the OO
+Figure/Agg API: no pyplot state machine, rasterized lines and a modest
+DPI, since the PNGs are artifacts rather than interactive views. pyplot
+is only imported for the interactive (no save_path) fallback.
 """
 from __future__ import annotations
 
 from typing import Optional
 
-import matplotlib.pyplot as plt
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def _draw_equity(ax, eq: pd.Series, title: Optional[str]) -> None:
+    ax.plot(eq.index, eq.values, label="Equity", rasterized=True)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Cumulative Return")
+    ax.grid(True)
+    if title:
+        ax.set_title(title)
+    ax.legend()
 
 
-def plot_equity_curve(returns: pd.Series, title: Optional[str] = None, save_path: Optional[str] = None) -> None:
-    eq = (1 + returns).cumprod()
-    plt.figure(figsize=(10, 5))
-    plt.plot(eq.index, eq.values, label="Equity")
-    plt.xlabel("Date")
-    plt.ylabel("Cumulative Return")
-    plt.grid(True)
+def _draw_drawdown(ax, dd: pd.Series, title: Optional[str]) -> None:
+    ax.plot(dd.index, dd.values, color="red", label="Drawdown", rasterized=True)
+    ax.fill_between(dd.index, dd.values, 0, color="red", alpha=0.2, rasterized=True)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Drawdown")
+    ax.grid(True)
     if title:
-        plt.title(title)
-    plt.legend()
+        ax.set_title(title)
+    ax.legend()
+
+
+def _save(fig: Figure, save_path: str) -> None:
+    FigureCanvasAgg(fig)
+    fig.savefig(save_path, dpi=90, bbox_inches="tight")
+
+
+def plot_equity_curve(
+    returns: pd.Series,
+    title: Optional[str] = None,
+    save_path: Optional[str] = None,
+    equity: Optional[pd.Series] = None,
+) -> None:
+    eq = (1 + returns).cumprod() if equity is None else equity
     if save_path:
-        plt.savefig(save_path, bbox_inches="tight")
+        fig = Figure(figsize=(10, 5))
+        _draw_equity(fig.add_subplot(), eq, title)
+        _save(fig, save_path)
     else:
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots(figsize=(10, 5))
+        _draw_equity(ax, eq, title)
         plt.show()
 
 
-def plot_drawdown(returns: pd.Series, title: Optional[str] = None, save_path: Optional[str] = None) -> None:
-    eq = (1 + returns).cumprod()
-    peak = eq.cummax()
-    dd = eq / peak - 1.0
-    plt.figure(figsize=(10, 4))
-    plt.plot(dd.index, dd.values, color="red", label="Drawdown")
-    plt.fill_between(dd.index, dd.values, 0, color="red", alpha=0.2)
-    plt.xlabel("Date")
-    plt.ylabel("Drawdown")
-    plt.grid(True)
-    if title:
-        plt.title(title)
-    plt.legend()
+def plot_drawdown(
+    returns: pd.Series,
+    title: Optional[str] = None,
+    save_path: Optional[str] = None,
+    dd: Optional[pd.Series] = None,
+) -> None:
+    if dd is None:
+        eq = (1 + returns).cumprod()
+        peak = eq.cummax()
+        dd = eq / peak - 1.0
     if save_path:
-        plt.savefig(save_path, bbox_inches="tight")
+        fig = Figure(figsize=(10, 4))
+        _draw_drawdown(fig.add_subplot(), dd, title)
+        _save(fig, save_path)
     else:
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots(figsize=(10, 4))
+        _draw_drawdown(ax, dd, title)
         plt.show()
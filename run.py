@@ -6,6 +6,7 @@ Usage examples in README.md
 from __future__ import annotations
 
 import argparse
+import hashlib
 import os
 from typing import List, Optional
 
@@ -13,10 +14,10 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 
-from data import get_sp500_tickers, load_or_download, to_long_panel
+from data import Panel, get_sp500_tickers, load_or_download
 from features import add_features, add_target
 from model import generate_monthly_positions
-from backtest import month_ends, backtest_positions
+from backtest import month_ends, backtest_positions, compute_perf_stats, equity_and_dd
 from report import plot_equity_curve, plot_drawdown
 
 
@@ -26,16 +27,8 @@ def _perf_stats(r: pd.Series, freq: int = 252) -> dict:
     if r.empty:
         return {"CAGR": np.nan, "Sharpe": np.nan, "MaxDD": np.nan}
 
-    eq = (1.0 + r).cumprod()
-    cagr = float(eq.iloc[-1] ** (freq / len(r)) - 1.0)
-
-    vol = float(r.std()) if float(r.std()) != 0.0 else np.nan
-    sharpe = float((r.mean() / (r.std() + 1e-12)) * (freq ** 0.5))
-
-    peak = eq.cummax()
-    mdd = float((eq / peak - 1.0).min())
-
-    return {"CAGR": cagr, "Sharpe": sharpe, "MaxDD": mdd}
+    # single numba pass over the return array
+    return compute_perf_stats(r, freq=freq)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -56,13 +49,25 @@ def main(argv: Optional[List[str]] = None) -> int:
     print(f"Downloading {len(tickers)} tickers from {args.start} to {args.end}")
     wide = load_or_download(args.cache, tickers, start=args.start, end=args.end)
 
-    panel = to_long_panel(wide)
-    panel = add_features(panel)
-    panel = add_target(panel, horizon=63)
+    panel = Panel.from_wide(wide)
+
+    # second-level cache: post-feature panel keyed by universe, range and feature-set version
+    key = hashlib.sha1(f"{sorted(tickers)}|{args.start}|{args.end}|v2".encode()).hexdigest()[:12]
+    panel_path = os.path.join(os.path.dirname(args.cache) or ".", f"panel_{key}.parquet")
+    if os.path.exists(panel_path):
+        panel = Panel.from_long(pd.read_parquet(panel_path))
+    else:
+        panel = add_features(panel)
+        panel = add_target(panel, horizon=63)
+        try:
+            panel.to_long().to_parquet(panel_path, compression="zstd")
+        except Exception:
+            # best-effort: ignore cache errors
+            pass
 
     # determine rebal dates
-    rebal_dates = month_ends(panel.index.get_level_values("date"))
-    feature_cols = [c for c in panel.columns if c != "y_fwd_3m"]
+    rebal_dates = month_ends(panel.dates)
+    feature_cols = [f for f in panel.fields if f != "y_fwd_3m"]
 
     print("Generating monthly positions (walk-forward)...")
     monthly_positions = generate_monthly_positions(panel, feature_cols, rebal_dates, top_q=0.10, bot_q=0.10)
@@ -102,8 +107,10 @@ def main(argv: Optional[List[str]] = None) -> int:
 
     print("Plotting...")
     os.makedirs("outputs", exist_ok=True)
-    plot_equity_curve(port_ret, title="ML Factor Equity", save_path="outputs/equity.png")
-    plot_drawdown(port_ret, title="ML Factor Drawdown", save_path="outputs/drawdown.png")
+    # single cumulative pass shared by both plots
+    eq, _, dd = equity_and_dd(port_ret)
+    plot_equity_curve(port_ret, title="ML Factor Equity", save_path="outputs/equity.png", equity=eq)
+    plot_drawdown(port_ret, title="ML Factor Drawdown", save_path="outputs/drawdown.png", dd=dd)
     print("Saved plots to outputs/")
 
     return 0